@@ -1,24 +1,85 @@
-from datetime import datetime, timedelta
-from typing import Optional
-
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
 from passlib.context import CryptContext
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from . import models, schemas, db, config
+from . import models, db, config
 
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Single configured scheme: resolve the handler once instead of dispatching through the context per call
+_pbkdf2_handler = pwd_context.handler("pbkdf2_sha256")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/admin/token")
 
 
+class CurrentUser(NamedTuple):
+    """Lightweight authenticated principal; avoids loading the full users row (incl. hashed_password)."""
+    id: int
+    username: str
+    is_admin: bool
+
+
+# Verified tokens -> (CurrentUser, exp); skips JWT decode and the users lookup on repeat hits
+_TOKEN_CACHE_TTL = 30  # seconds
+_TOKEN_CACHE_MIN_REMAINING = 5  # don't cache tokens this close to expiry
+_token_cache = TTLCache(maxsize=10_000, ttl=_TOKEN_CACHE_TTL)
+# TTLCache is not thread-safe; locked like app/cache.py in case a lookup ever runs off the event loop
+_token_cache_lock = threading.Lock()
+
+_HS_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+_jwt_key = config.settings.JWT_SECRET_KEY.encode("utf-8")
+_jwt_digest = _HS_DIGESTS[config.settings.JWT_ALGORITHM]
+# Algorithm and key are fixed, so the encoded JWS header is too
+_jwt_header_b64 = base64.urlsafe_b64encode(
+    json.dumps({"alg": config.settings.JWT_ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode()
+).rstrip(b"=")
+
+
+# PBKDF2-SHA256 via hashlib (OpenSSL C loop), emitting passlib's "$pbkdf2-sha256$rounds$salt$hash" format
+_PBKDF2_PREFIX = "$pbkdf2-sha256$"
+_PBKDF2_ROUNDS = 29000  # passlib's pbkdf2_sha256 default, keeps new hashes identical in cost
+_PBKDF2_SALT_SIZE = 16
+
+
+def _ab64_encode(data: bytes) -> str:
+    return base64.b64encode(data).decode("ascii").rstrip("=").replace("+", ".")
+
+
+def _ab64_decode(data: str) -> bytes:
+    data = data.replace(".", "+")
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    if hashed_password.startswith(_PBKDF2_PREFIX):
+        try:
+            rounds, salt, checksum = hashed_password[len(_PBKDF2_PREFIX):].split("$")
+            salt_bytes, expected = _ab64_decode(salt), _ab64_decode(checksum)
+            rounds = int(rounds)
+        except ValueError:
+            # Malformed or unusual encoding: let passlib decide
+            return _pbkdf2_handler.verify(plain_password, hashed_password)
+        derived = hashlib.pbkdf2_hmac("sha256", plain_password.encode("utf-8"), salt_bytes, rounds, len(expected))
+        return hmac.compare_digest(derived, expected)
+    return _pbkdf2_handler.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    salt = os.urandom(_PBKDF2_SALT_SIZE)
+    checksum = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, _PBKDF2_ROUNDS, 32)
+    return f"{_PBKDF2_PREFIX}{_PBKDF2_ROUNDS}${_ab64_encode(salt)}${_ab64_encode(checksum)}"
 
 
 def authenticate_user(db_session: Session, username: str, password: str) -> Optional[models.User]:
@@ -30,38 +91,114 @@ def authenticate_user(db_session: Session, username: str, password: str) -> Opti
     return user
 
 
+def _b64url_encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _verify_hs(token: str) -> Optional[dict]:
+    """
+    Verify a compact HMAC-signed JWT in a single pass and return its payload, or None if invalid.
+    The header is covered by the MAC, so it is not decoded; exp is left to the caller.
+    """
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    header_b64, payload_b64, sig_b64 = parts
+    try:
+        signature = _b64url_decode(sig_b64)
+    except ValueError:
+        return None
+    expected = hmac.new(_jwt_key, f"{header_b64}.{payload_b64}".encode("ascii", "replace"), _jwt_digest).digest()
+    if not hmac.compare_digest(signature, expected):
+        return None
+    try:
+        payload = json.loads(_b64url_decode(payload_b64))
+    except ValueError:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=config.settings.ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, config.settings.JWT_SECRET_KEY, algorithm=config.settings.JWT_ALGORITHM)
-    return encoded_jwt
+    # Integer epoch seconds (NumericDate) so decoding never goes through datetime parsing
+    expires_delta = expires_delta or timedelta(minutes=config.settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode["exp"] = int(time.time() + expires_delta.total_seconds())
+    signing_input = _jwt_header_b64 + b"." + _b64url_encode(json.dumps(to_encode, separators=(",", ":")).encode())
+    signature = hmac.new(_jwt_key, signing_input, _jwt_digest).digest()
+    return (signing_input + b"." + _b64url_encode(signature)).decode("ascii")
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db_session: Session = Depends(db.get_db)
-) -> models.User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, config.settings.JWT_SECRET_KEY, algorithms=[config.settings.JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-
-    user = db_session.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
-    return user
 
 
-def get_current_admin_user(current_user: models.User = Depends(get_current_user)) -> models.User:
-    if not current_user.is_admin:
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _cached_user(cache_key: bytes) -> Optional[CurrentUser]:
+    with _token_cache_lock:
+        cached = _token_cache.get(cache_key)
+        if cached is not None:
+            user, exp = cached
+            if exp > time.time():
+                return user
+            _token_cache.pop(cache_key, None)
+    return None
+
+
+def _token_claims(token: str) -> tuple:
+    """Return (username, exp) from a valid, unexpired token; raise 401 otherwise."""
+    payload = _verify_hs(token)
+    if payload is None:
+        raise _credentials_exception()
+    username = payload.get("sub")
+    exp = payload.get("exp")
+    if not isinstance(username, str) or not isinstance(exp, (int, float)) or exp <= time.time():
+        raise _credentials_exception()
+    return username, exp
+
+
+def _remember(cache_key: bytes, user: CurrentUser, exp: float) -> None:
+    if exp - time.time() > _TOKEN_CACHE_MIN_REMAINING:
+        with _token_cache_lock:
+            _token_cache[cache_key] = (user, exp)
+
+
+def _load_user(db_session: Session, username: str) -> CurrentUser:
+    # Index-only scan on ix_users_username_covering; hashed_password is never read here
+    row = db_session.execute(
+        select(models.User.id, models.User.username, models.User.is_admin).where(models.User.username == username)
+    ).first()
+    if row is None:
+        raise _credentials_exception()
+    return CurrentUser(row.id, row.username, bool(row.is_admin))
+
+
+async def require_admin(
+    token: str = Depends(oauth2_scheme), db_session: Session = Depends(db.get_db)
+) -> CurrentUser:
+    """
+    Single-step admin dependency for protected endpoints: token cache lookup, JWT verification and
+    the is_admin check in one body (no nested dependency chain). Cache hits stay on the event loop;
+    only a cache miss hops to the threadpool for the users lookup. The session is the request's own
+    get_db session (FastAPI caches dependencies per request), so the lookup and the endpoint share
+    one pooled connection; on a cache hit no connection is checked out for auth at all.
+    """
+    cache_key = _token_cache_key(token)
+    user = _cached_user(cache_key)
+    if user is None:
+        username, exp = _token_claims(token)
+        user = await run_in_threadpool(_load_user, db_session, username)
+        _remember(cache_key, user, exp)
+    if not user.is_admin:
         raise HTTPException(status_code=403, detail="Admin privileges required")
-    return current_user
\ No newline at end of file
+    return user
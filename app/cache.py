@@ -0,0 +1,42 @@
+import threading
+from typing import Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+# Encoded JSON bodies of public poll reads (/poll/active, /poll/by-slug), keyed per endpoint and
+# parameters. Admin changes clear it in this process; other workers catch up within the TTL.
+PUBLIC_POLL_TTL = 5  # seconds
+_public_polls = TTLCache(maxsize=512, ttl=PUBLIC_POLL_TTL)
+# (ETag, encoded body) of /poll/status/* answers for existing polls, keyed by lookup column and
+# lowercased value. The UI polls these from every open tab; a shorter TTL bounds how stale "expired" gets.
+POLL_STATUS_TTL = 3  # seconds
+_poll_status = TTLCache(maxsize=4096, ttl=POLL_STATUS_TTL)
+# Sync endpoints run in worker threads and TTLCache is not thread-safe
+_lock = threading.Lock()
+
+
+def get_public(key: Hashable) -> Optional[bytes]:
+    with _lock:
+        return _public_polls.get(key)
+
+
+def put_public(key: Hashable, body: bytes) -> None:
+    with _lock:
+        _public_polls[key] = body
+
+
+def get_status(key: Hashable) -> Optional[Tuple[str, bytes]]:
+    with _lock:
+        return _poll_status.get(key)
+
+
+def put_status(key: Hashable, etag: str, body: bytes) -> None:
+    with _lock:
+        _poll_status[key] = (etag, body)
+
+
+def invalidate_public() -> None:
+    """Drop cached public poll and status responses; call after any admin change to polls."""
+    with _lock:
+        _public_polls.clear()
+        _poll_status.clear()
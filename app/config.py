@@ -20,21 +20,46 @@ class Settings(BaseSettings):
     DB_SSLMODE: str = Field("require", env="DB_SSLMODE")
 
     # SQLAlchemy connection pool settings (tunable via env)
-    DB_POOL_SIZE: int = Field(5, env="DB_POOL_SIZE")
-    DB_POOL_MAX_OVERFLOW: int = Field(10, env="DB_POOL_MAX_OVERFLOW")
+    DB_POOL_SIZE: int = Field(25, env="DB_POOL_SIZE")
+    DB_POOL_MAX_OVERFLOW: int = Field(25, env="DB_POOL_MAX_OVERFLOW")
     DB_POOL_RECYCLE: int = Field(1800, env="DB_POOL_RECYCLE")  # seconds; 30 minutes
     DB_POOL_PRE_PING: bool = Field(True, env="DB_POOL_PRE_PING")
     DB_POOL_USE_LIFO: bool = Field(True, env="DB_POOL_USE_LIFO")
+    # Seconds a request waits for a free pooled connection before failing (QueuePool only)
+    DB_POOL_TIMEOUT: int = Field(30, env="DB_POOL_TIMEOUT")
+    # Entries in SQLAlchemy's compiled-SQL cache (per engine); SQLAlchemy's default is 500
+    DB_QUERY_CACHE_SIZE: int = Field(1200, env="DB_QUERY_CACHE_SIZE")
     # Use 'NullPool' when connecting via PgBouncer in transaction pooling mode, else QueuePool
     DB_POOLCLASS: str = Field("QueuePool", env="DB_POOLCLASS")
 
+    # Reject typos instead of silently falling back to an untuned default pool
+    @validator("DB_POOLCLASS")
+    def _check_poolclass(cls, v: str) -> str:
+        if (v or "QueuePool").lower() not in ("queuepool", "nullpool"):
+            raise ValueError("DB_POOLCLASS must be 'QueuePool' or 'NullPool'")
+        return v or "QueuePool"
+    # Worker threads for sync endpoints (anyio default is 40); unset = one per pooled DB connection
+    THREADPOOL_SIZE: Optional[int] = Field(None, env="THREADPOOL_SIZE")
+    # libpq TCP keepalives so half-open TLS sessions are detected instead of stalling request threads
+    DB_KEEPALIVES_IDLE: int = Field(30, env="DB_KEEPALIVES_IDLE")  # seconds
+    # Server-side statement_timeout per connection; 0 disables (e.g. PgBouncer rejecting startup options)
+    DB_STATEMENT_TIMEOUT_MS: int = Field(5000, env="DB_STATEMENT_TIMEOUT_MS")
+    # Development/CI guard: ORM queries raise instead of silently lazy loading a relationship
+    DB_RAISE_ON_LAZY_LOAD: bool = Field(False, env="DB_RAISE_ON_LAZY_LOAD")
+
     # Simple admin credentials (read from .env)
     ADMIN_USERNAME: str = Field(..., env="ADMIN_USERNAME")
     ADMIN_PASSWORD: str = Field(..., env="ADMIN_PASSWORD")
+    # Optional precomputed $pbkdf2-sha256$ hash for the bootstrap admin; skips hashing on first start
+    ADMIN_PASSWORD_HASH: Optional[str] = Field(None, env="ADMIN_PASSWORD_HASH")
 
     # Optional full URL (overrides components if provided)
     DATABASE_URL: Optional[str] = None
 
+    # Comma-separated list of allowed CORS origins; "*" (default) allows any origin without credentials
+    CORS_ALLOW_ORIGINS: str = Field("*", env="CORS_ALLOW_ORIGINS")
+    CORS_MAX_AGE: int = Field(86400, env="CORS_MAX_AGE")  # seconds browsers may cache preflight results
+
     JWT_SECRET_KEY: str = Field("supersecretkey", env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60  # 1 hour
@@ -43,6 +68,18 @@ class Settings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
 
+    @property
+    def cors_origins(self) -> list:
+        return [o.strip() for o in self.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
+
+    @property
+    def threadpool_size(self) -> int:
+        if self.THREADPOOL_SIZE:
+            return self.THREADPOOL_SIZE
+        if self.DB_POOLCLASS.lower() == "queuepool":
+            return self.DB_POOL_SIZE + self.DB_POOL_MAX_OVERFLOW
+        return 40
+
     @property
     def database_url(self) -> str:
         """
@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import logging
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, declarative_base, raiseload
 from .config import settings
 
 # Configure SQLAlchemy engine with tuned pooling options (env-configurable)
@@ -10,29 +12,63 @@ pool_kwargs = {
     "pool_recycle": settings.DB_POOL_RECYCLE,
 }
 
-poolclass = None
-_poolclass_cfg = (settings.DB_POOLCLASS or "QueuePool").lower()
+# DB_POOLCLASS is validated in config, so this is always one of the two supported pools
+_poolclass_cfg = settings.DB_POOLCLASS.lower()
 if _poolclass_cfg == "queuepool":
     poolclass = QueuePool
     pool_kwargs.update({
         "pool_size": settings.DB_POOL_SIZE,
         "max_overflow": settings.DB_POOL_MAX_OVERFLOW,
         "pool_use_lifo": settings.DB_POOL_USE_LIFO,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
     })
-elif _poolclass_cfg == "nullpool":
+else:
     from sqlalchemy.pool import NullPool
     poolclass = NullPool
 
+# libpq connection options (psycopg2 only): keepalives and a per-connection statement timeout
+connect_args = {}
+if settings.database_url.startswith("postgresql"):
+    connect_args.update({
+        "keepalives": 1,
+        "keepalives_idle": settings.DB_KEEPALIVES_IDLE,
+    })
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+
 engine = create_engine(
     settings.database_url,
     echo=False,
     future=True,
-    poolclass=poolclass,  # None means default QueuePool
+    poolclass=poolclass,
+    connect_args=connect_args,
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
     **pool_kwargs,
 )
 
+# Fail fast if the engine did not end up with the configured pool (tuning would be silently lost)
+if not isinstance(engine.pool, poolclass):
+    raise RuntimeError(f"Expected {poolclass.__name__}, engine created {type(engine.pool).__name__}")
+logging.getLogger(__name__).info(
+    "DB pool: %s (size=%s, max_overflow=%s, pre_ping=%s, recycle=%ss)",
+    poolclass.__name__,
+    pool_kwargs.get("pool_size", "-"),
+    pool_kwargs.get("max_overflow", "-"),
+    settings.DB_POOL_PRE_PING,
+    settings.DB_POOL_RECYCLE,
+)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if settings.DB_RAISE_ON_LAZY_LOAD:
+    # Any relationship a query did not eager load raises on access when it would emit SQL, so a
+    # serializer touching a new relationship fails in dev/CI instead of becoming an N+1 in production.
+    # Explicit selectinload/joinedload options take precedence over the wildcard.
+    @event.listens_for(SessionLocal, "do_orm_execute")
+    def _raise_on_lazy_load(execute_state):
+        if execute_state.is_select and not execute_state.is_column_load and not execute_state.is_relationship_load:
+            execute_state.statement = execute_state.statement.options(raiseload("*", sql_only=True))
+
 # Proper DB dependency for FastAPI (avoids 422 from sessionmaker signature)
 # Usage: db_session: Session = Depends(db.get_db)
 
@@ -1,3 +1,8 @@
+import os
+from functools import lru_cache
+
+import anyio
+import jinja2
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
@@ -6,33 +11,50 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi import Request
 
-from . import db, models, auth
+from . import db, models, auth, config, migrate
+from .responses import ORJSONUTCResponse
 from .routers import admin, poll
-from sqlalchemy import text
 
+# orjson for every JSON route by default, with the same datetime encoding as the routers
 app = FastAPI(
     title="Voting & Trivia Application",
     description="API for creating polls/trivia, collecting votes, and viewing results.",
     version="0.1.0",
+    default_response_class=ORJSONUTCResponse,
 )
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
-# Allow frontend (served from same origin or any for dev)
+# Templates only change on deploy: skip per-request mtime checks and reuse compiled bytecode across restarts
+templates.env.auto_reload = False
+templates.env.bytecode_cache = jinja2.FileSystemBytecodeCache()
+
+
+@lru_cache(maxsize=None)
+def render_shell(name: str) -> str:
+    """Render a context-free UI shell once; the attendee shell is identical for every request."""
+    return templates.get_template(name).render()
+
+# Allow frontend (served from same origin; extra origins via CORS_ALLOW_ORIGINS).
+# Explicit method/header lists keep Starlette on its precomputed-header path, and max_age lets
+# browsers skip the OPTIONS preflight on repeat cross-origin calls. Auth is a bearer header, not a
+# cookie, so credentials are only allowed for explicitly listed origins (never with "*").
+_cors_origins = config.settings.cors_origins
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=_cors_origins,
+    allow_credentials="*" not in _cors_origins,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["authorization", "content-type"],
+    max_age=config.settings.CORS_MAX_AGE,
 )
 
 # Include routers
 # Root endpoint  serve the attendee UI (index.html)
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return HTMLResponse(render_shell("index.html"))
 
 # Admin dashboard  serve the admin UI (admin.html)
 @app.get("/admin", response_class=HTMLResponse)
@@ -43,38 +65,12 @@ app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(poll.router, prefix="/poll", tags=["poll"])
 
 # Lightweight, idempotent migrations to keep DB schema in sync when columns are added later
-# This avoids 500s like "column polls.slug does not exist" on older databases
+# This avoids 500s like "column polls.slug does not exist" on older databases.
+# Guarded by an advisory lock + schema_migrations version row (see app/migrate.py), so with
+# several workers only one runs the DDL and an up-to-date database skips it entirely.
 
 def run_startup_migrations():
-    with db.engine.begin() as conn:
-        # Add missing columns if the DB was created before these fields existed
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS slug VARCHAR(255);"))
-        # Create a unique index for slug to mimic uniqueness (portable and safe)
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_polls_slug ON polls (slug);"))
-
-        conn.execute(text("ALTER TABLE choices ADD COLUMN IF NOT EXISTS is_correct BOOLEAN DEFAULT FALSE;"))
-        conn.execute(text("UPDATE choices SET is_correct = FALSE WHERE is_correct IS NULL;"))
-
-        # In case participants.company was added later
-        conn.execute(text("ALTER TABLE participants ADD COLUMN IF NOT EXISTS company VARCHAR(150);"))
-
-        # Poll type column for different modes: 'trivia' (has correct answers) vs 'survey'/'poll'
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS poll_type VARCHAR(20) DEFAULT 'trivia';"))
-        # Archived flag to preserve analytics but hide from attendee selection
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS archived BOOLEAN DEFAULT FALSE;"))
-
-        # Votes: ensure question_id exists and is backfilled; add unique index to prevent duplicate votes per question
-        conn.execute(text("ALTER TABLE votes ADD COLUMN IF NOT EXISTS question_id INTEGER;"))
-        conn.execute(text(
-            """
-            UPDATE votes v
-            SET question_id = c.question_id
-            FROM choices c
-            WHERE v.choice_id = c.id AND v.question_id IS NULL;
-            """
-        ))
-        conn.execute(text("ALTER TABLE votes ALTER COLUMN question_id SET NOT NULL;"))
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_votes_participant_question ON votes (participant_id, question_id);"))
+    migrate.run()
 
 # Create DB tables on startup if they don't exist
 @app.on_event("startup")
@@ -88,11 +84,12 @@ def on_startup():
     # Ensure a default admin user exists
     db_session = db.SessionLocal()
     try:
-        admin_exists = db_session.query(models.User).filter(models.User.is_admin == True).first()
+        # Only project the id; the (expensive) password hash is computed only when bootstrapping
+        admin_exists = db_session.query(models.User.id).filter(models.User.is_admin == True).first()
         if not admin_exists:
             default_admin = models.User(
                 username="admin",
-                hashed_password=auth.get_password_hash("admin123"),
+                hashed_password=config.settings.ADMIN_PASSWORD_HASH or auth.get_password_hash("admin123"),
                 is_admin=True,
             )
             db_session.add(default_admin)
@@ -100,19 +97,35 @@ def on_startup():
     finally:
         db_session.close()
 
-# Catch-all for attendee deep-links like /abcde (slug). Avoid reserved prefixes.
-RESERVED_PREFIXES = {"admin", "poll", "static", "docs", "redoc", "openapi.json"}
+    # Warm the template cache so the first attendee request only pays for the response
+    templates.env.get_template("admin.html")
+    render_shell("index.html")
 
+# Sync endpoints (all DB work) run in anyio's worker threads. Size that pool to the DB pool so
+# concurrency is bounded by connections rather than by anyio's default of 40 threads.
+@app.on_event("startup")
+async def size_threadpool():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.settings.threadpool_size
+
+# Catch-all for attendee deep-links like /abcde (slug). Every path gets the same shell; the client
+# decides whether it is a join code.
 @app.get("/{slug}", response_class=HTMLResponse)
 async def serve_slug(request: Request, slug: str):
-    # Only serve app shell for simple slug patterns; otherwise 404 so API routes work
-    import re
-    if slug in RESERVED_PREFIXES:
-        # Let other routers handle it
-        return templates.TemplateResponse("index.html", {"request": request})
-    if not re.fullmatch(r"[a-z0-9-]{5,64}", slug):
-        # Not a join code; serve index shell anyway to allow client-side handling
-        return templates.TemplateResponse("index.html", {"request": request})
-    return templates.TemplateResponse("index.html", {"request": request})
+    return HTMLResponse(render_shell("index.html"))
+
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # uvloop + httptools; one worker by default. Each worker has its own DB pool and threadpool, so
+    # UVICORN_WORKERS multiplies connections: keep workers * (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW) under
+    # Postgres max_connections. Autoreload is opt-in for development (single process + file watcher).
+    reload = os.getenv("UVICORN_RELOAD", "false").lower() == "true"
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("UVICORN_HOST", "0.0.0.0"),
+        port=int(os.getenv("UVICORN_PORT", "8000")),
+        workers=1 if reload else int(os.getenv("UVICORN_WORKERS", "1")),
+        loop="uvloop",
+        http="httptools",
+        reload=reload,
+        ssl_certfile=os.getenv("UVICORN_SSL_CERTFILE") or None,
+        ssl_keyfile=os.getenv("UVICORN_SSL_KEYFILE") or None,
+    )
\ No newline at end of file
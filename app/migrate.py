@@ -2,50 +2,141 @@ from sqlalchemy import text
 from . import db
 
 
-def run():
-    """
-    Idempotent schema migrations to keep older databases in sync with current models.
-    - Adds polls.slug (and a unique index) if missing
-    - Adds choices.is_correct (default false) if missing; backfills NULL to FALSE
-    - Adds participants.company if missing
-    - Adds votes.question_id (backfilled from choices) and unique index on (participant_id, question_id)
-    - Adds polls.poll_type with default 'trivia'
-    - Adds polls.archived (default false)
-    """
-    with db.engine.begin() as conn:
+# Versioned, idempotent schema steps. Append a new (version, statements) entry for schema changes;
+# applied versions are recorded in schema_migrations so already-migrated databases skip the DDL.
+# Statements must be ';'-terminated plain SQL: each step is sent as a single multi-statement batch.
+MIGRATIONS = [
+    (1, [
         # Polls: slug column + unique index (allows multiple NULLs)
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS slug VARCHAR(255);"))
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_polls_slug ON polls (slug);"))
+        "ALTER TABLE polls ADD COLUMN IF NOT EXISTS slug VARCHAR(255);",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_polls_slug ON polls (slug);",
 
         # Choices: is_correct, default false (used by trivia type)
-        conn.execute(text("ALTER TABLE choices ADD COLUMN IF NOT EXISTS is_correct BOOLEAN DEFAULT FALSE;"))
-        conn.execute(text("UPDATE choices SET is_correct = FALSE WHERE is_correct IS NULL;"))
+        "ALTER TABLE choices ADD COLUMN IF NOT EXISTS is_correct BOOLEAN DEFAULT FALSE;",
+        "UPDATE choices SET is_correct = FALSE WHERE is_correct IS NULL;",
 
         # Participants: optional company field
-        conn.execute(text("ALTER TABLE participants ADD COLUMN IF NOT EXISTS company VARCHAR(150);"))
+        "ALTER TABLE participants ADD COLUMN IF NOT EXISTS company VARCHAR(150);",
 
         # Poll type: supports 'trivia' (has correct answers) and 'survey'/'poll' (no correct answers)
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS poll_type VARCHAR(20) DEFAULT 'trivia';"))
+        "ALTER TABLE polls ADD COLUMN IF NOT EXISTS poll_type VARCHAR(20) DEFAULT 'trivia';",
         # Archive flag to keep historical analytics while hiding from active selection
-        conn.execute(text("ALTER TABLE polls ADD COLUMN IF NOT EXISTS archived BOOLEAN DEFAULT FALSE;"))
+        "ALTER TABLE polls ADD COLUMN IF NOT EXISTS archived BOOLEAN DEFAULT FALSE;",
 
         # Votes: add question_id, backfill from choices, set NOT NULL, and enforce uniqueness per participant/question
-        conn.execute(text("ALTER TABLE votes ADD COLUMN IF NOT EXISTS question_id INTEGER;"))
+        "ALTER TABLE votes ADD COLUMN IF NOT EXISTS question_id INTEGER;",
         # Backfill question_id using choice -> question mapping
-        conn.execute(text(
-            """
-            UPDATE votes v
-            SET question_id = c.question_id
-            FROM choices c
-            WHERE v.choice_id = c.id AND v.question_id IS NULL;
-            """
-        ))
+        """
+        UPDATE votes v
+        SET question_id = c.question_id
+        FROM choices c
+        WHERE v.choice_id = c.id AND v.question_id IS NULL;
+        """,
         # Ensure NOT NULL after backfill
-        conn.execute(text("ALTER TABLE votes ALTER COLUMN question_id SET NOT NULL;"))
+        "ALTER TABLE votes ALTER COLUMN question_id SET NOT NULL;",
         # Unique constraint to prevent duplicate votes per participant/question
-        conn.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS uq_votes_participant_question ON votes (participant_id, question_id);"))
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_votes_participant_question ON votes (participant_id, question_id);",
+    ]),
+    (2, [
+        # Users: covering index for the auth lookup (username -> id, is_admin) as an index-only scan
+        "CREATE INDEX IF NOT EXISTS ix_users_username_covering ON users (username) INCLUDE (id, is_admin);",
+    ]),
+    (3, [
+        # Users: partial index so admin-existence checks are index-only scans
+        "CREATE INDEX IF NOT EXISTS ix_users_admin ON users (id) WHERE is_admin = true;",
+    ]),
+    (4, [
+        # Polls: pattern-ops index so the unique-slug prefix LIKE can use an index under any collation
+        "CREATE INDEX IF NOT EXISTS ix_polls_slug_pattern ON polls (slug varchar_pattern_ops);",
+    ]),
+    (5, [
+        # Foreign keys cascade on delete so removing a poll is one DELETE (default <table>_<column>_fkey names)
+        "ALTER TABLE questions DROP CONSTRAINT IF EXISTS questions_poll_id_fkey, "
+        "ADD CONSTRAINT questions_poll_id_fkey FOREIGN KEY (poll_id) REFERENCES polls(id) ON DELETE CASCADE;",
+        "ALTER TABLE choices DROP CONSTRAINT IF EXISTS choices_question_id_fkey, "
+        "ADD CONSTRAINT choices_question_id_fkey FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE;",
+        "ALTER TABLE participants DROP CONSTRAINT IF EXISTS participants_poll_id_fkey, "
+        "ADD CONSTRAINT participants_poll_id_fkey FOREIGN KEY (poll_id) REFERENCES polls(id) ON DELETE CASCADE;",
+        "ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_participant_id_fkey, "
+        "ADD CONSTRAINT votes_participant_id_fkey FOREIGN KEY (participant_id) REFERENCES participants(id) ON DELETE CASCADE;",
+        "ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_choice_id_fkey, "
+        "ADD CONSTRAINT votes_choice_id_fkey FOREIGN KEY (choice_id) REFERENCES choices(id) ON DELETE CASCADE;",
+        "ALTER TABLE votes DROP CONSTRAINT IF EXISTS votes_question_id_fkey, "
+        "ADD CONSTRAINT votes_question_id_fkey FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE;",
+    ]),
+    (6, [
+        # Polls: expression indexes for case-insensitive slug/title lookups
+        "CREATE INDEX IF NOT EXISTS ix_polls_lower_slug ON polls (lower(slug));",
+        "CREATE INDEX IF NOT EXISTS ix_polls_lower_title ON polls (lower(title));",
+    ]),
+    (7, [
+        # Foreign-key columns: btree indexes for the per-poll joins, vote aggregates and cascading deletes
+        "CREATE INDEX IF NOT EXISTS ix_questions_poll_id ON questions (poll_id);",
+        "CREATE INDEX IF NOT EXISTS ix_choices_question_id ON choices (question_id);",
+        "CREATE INDEX IF NOT EXISTS ix_participants_poll_id ON participants (poll_id);",
+        "CREATE INDEX IF NOT EXISTS ix_votes_choice_id ON votes (choice_id);",
+        "CREATE INDEX IF NOT EXISTS ix_votes_participant_id ON votes (participant_id);",
+        "CREATE INDEX IF NOT EXISTS ix_votes_question_id ON votes (question_id);",
+    ]),
+    (8, [
+        # Polls: partial index over attendee-visible polls, keyed by lower(poll_type)
+        "CREATE INDEX IF NOT EXISTS ix_polls_active_lower_type ON polls (lower(poll_type)) "
+        "WHERE is_active = true AND archived = false;",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary application-wide key for the migration advisory lock
+MIGRATION_LOCK_KEY = 74_601_172
+
+
+def run():
+    """
+    Idempotent schema migrations to keep older databases in sync with current models.
+    Version 1:
+    - Adds polls.slug (and a unique index) if missing
+    - Adds choices.is_correct (default false) if missing; backfills NULL to FALSE
+    - Adds participants.company if missing
+    - Adds votes.question_id (backfilled from choices) and unique index on (participant_id, question_id)
+    - Adds polls.poll_type with default 'trivia'
+    - Adds polls.archived (default false)
+    Version 2:
+    - Adds covering index ix_users_username_covering on users (username) INCLUDE (id, is_admin)
+    Version 3:
+    - Adds partial index ix_users_admin on users (id) WHERE is_admin = true
+    Version 4:
+    - Adds ix_polls_slug_pattern on polls (slug varchar_pattern_ops) for slug prefix lookups
+    Version 5:
+    - Recreates the questions/choices/participants/votes foreign keys with ON DELETE CASCADE
+    Version 6:
+    - Adds expression indexes ix_polls_lower_slug (lower(slug)) and ix_polls_lower_title (lower(title))
+    Version 7:
+    - Adds indexes on the foreign-key columns of questions, choices, participants and votes
+    Version 8:
+    - Adds partial index ix_polls_active_lower_type on polls (lower(poll_type)) for active, unarchived polls
+
+    Runs under a transaction-scoped advisory lock: when several workers start at once only one
+    migrates and the rest return immediately. Databases already at SCHEMA_VERSION only pay the
+    version check.
+    """
+    with db.engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": MIGRATION_LOCK_KEY}).scalar():
+            return
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY);"))
+        current = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")).scalar()
+        if current < SCHEMA_VERSION:
+            # Backfills may outlast the request-sized statement_timeout set on pooled connections
+            conn.execute(text("SET LOCAL statement_timeout = 0;"))
+        # Each pending step (plus its version row) goes to the server as one multi-statement round-trip
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            batch = [statement.strip() for statement in statements]
+            batch.append(f"INSERT INTO schema_migrations (version) VALUES ({int(version)});")
+            conn.exec_driver_sql("\n".join(batch))
 
 
 if __name__ == "__main__":
     run()
-    print("Migrations applied successfully.")
\ No newline at end of file
+    print("Migrations applied successfully.")
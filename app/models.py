@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index, Text, func, text
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -12,6 +12,13 @@ class User(Base):
 
     polls = relationship("Poll", back_populates="creator")
 
+    __table_args__ = (
+        # Covering index: token -> user lookups are index-only scans that never touch hashed_password
+        Index("ix_users_username_covering", "username", postgresql_include=["id", "is_admin"]),
+        # Partial index for "any admin?" checks (startup bootstrap) without scanning all users
+        Index("ix_users_admin", "id", postgresql_where=text("is_admin = true")),
+    )
+
 
 class Poll(Base):
     __tablename__ = "polls"
@@ -28,52 +35,67 @@ class Poll(Base):
     created_by = Column(Integer, ForeignKey("users.id"))
 
     creator = relationship("User", back_populates="polls")
-    questions = relationship("Question", back_populates="poll", cascade="all, delete-orphan")
-    participants = relationship("Participant", back_populates="poll", cascade="all, delete-orphan")
+    questions = relationship("Question", back_populates="poll", cascade="all, delete-orphan", passive_deletes=True)
+    participants = relationship("Participant", back_populates="poll", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Pattern-ops index so slug LIKE 'prefix%' (unique-slug lookup) is an index range scan under
+        # non-C collations, where the unique btree on slug cannot serve LIKE
+        Index("ix_polls_slug_pattern", "slug", postgresql_ops={"slug": "varchar_pattern_ops"}),
+        # Expression indexes for the case-insensitive lower(slug) / lower(title) = lower(:param) lookups
+        Index("ix_polls_lower_slug", func.lower(slug)),
+        Index("ix_polls_lower_title", func.lower(title)),
+        # Attendee-visible polls only (is_active and not archived), keyed by lower(poll_type) for /active?type=
+        Index(
+            "ix_polls_active_lower_type",
+            func.lower(poll_type),
+            postgresql_where=text("is_active = true AND archived = false"),
+        ),
+    )
 
 
 class Question(Base):
     __tablename__ = "questions"
 
     id = Column(Integer, primary_key=True, index=True)
-    poll_id = Column(Integer, ForeignKey("polls.id"))
+    poll_id = Column(Integer, ForeignKey("polls.id", ondelete="CASCADE"), index=True)
     text = Column(Text, nullable=False)
 
     poll = relationship("Poll", back_populates="questions")
-    choices = relationship("Choice", back_populates="question", cascade="all, delete-orphan")
+    choices = relationship("Choice", back_populates="question", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Choice(Base):
     __tablename__ = "choices"
 
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id"))
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), index=True)
     text = Column(String(255), nullable=False)
     is_correct = Column(Boolean, default=False)
 
     question = relationship("Question", back_populates="choices")
-    votes = relationship("Vote", back_populates="choice", cascade="all, delete-orphan")
+    votes = relationship("Vote", back_populates="choice", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Participant(Base):
     __tablename__ = "participants"
 
     id = Column(Integer, primary_key=True, index=True)
-    poll_id = Column(Integer, ForeignKey("polls.id"))
+    poll_id = Column(Integer, ForeignKey("polls.id", ondelete="CASCADE"), index=True)
     name = Column(String(150), nullable=False)
     company = Column(String(150), nullable=True)
 
     poll = relationship("Poll", back_populates="participants")
-    votes = relationship("Vote", back_populates="participant", cascade="all, delete-orphan")
+    votes = relationship("Vote", back_populates="participant", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Vote(Base):
     __tablename__ = "votes"
 
     id = Column(Integer, primary_key=True, index=True)
-    participant_id = Column(Integer, ForeignKey("participants.id"))
-    choice_id = Column(Integer, ForeignKey("choices.id"))
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    participant_id = Column(Integer, ForeignKey("participants.id", ondelete="CASCADE"), index=True)
+    choice_id = Column(Integer, ForeignKey("choices.id", ondelete="CASCADE"), index=True)
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False, index=True)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
     participant = relationship("Participant", back_populates="votes")
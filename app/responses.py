@@ -0,0 +1,43 @@
+import hashlib
+
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import ORJSONResponse
+
+# datetimes are encoded by orjson (in C) instead of .isoformat() in Python. Columns are TIMESTAMPTZ, so
+# values are aware; any naive one is treated as UTC. UTC is written as "Z", and timestamps are second
+# precision (what the UI shows).
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_OMIT_MICROSECONDS
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+class ORJSONUTCResponse(ORJSONResponse):
+    """
+    ORJSONResponse using the app's datetime options. Returning an instance directly (rather than a
+    dict) also skips FastAPI's jsonable_encoder pass, which would stringify datetimes itself.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def weak_etag(*parts) -> str:
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+
+def body_etag(body: bytes) -> str:
+    return weak_etag(hashlib.blake2b(body, digest_size=8).hexdigest())
+
+
+def not_modified(request: Request, etag: str):
+    """
+    304 response (no body) when the client's If-None-Match already names etag, else None. Used by the
+    endpoints the UI polls, so unchanged state is neither re-serialized nor re-sent.
+    """
+    header = request.headers.get("if-none-match")
+    if header and (header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))):
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
@@ -1,50 +1,107 @@
-from datetime import datetime, timezone
-from typing import List
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import re
+import string
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
 import random
-import io, csv
+import csv
+import io
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from sqlalchemy import func, text
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 
-from .. import models, schemas, db, auth, config
+from .. import models, schemas, db, auth, cache, config
+from ..responses import ORJSONUTCResponse
 
-router = APIRouter()
+# No response_model anywhere here: responses are built from our own data, so validating them again is
+# pure overhead (schemas stay in the OpenAPI docs via responses=).
+# orjson instead of stdlib json for dicts returned here. FastAPI still runs jsonable_encoder on plain
+# return values, so endpoints returning polls hand their data to ORJSONUTCResponse directly.
+router = APIRouter(default_response_class=ORJSONUTCResponse)
 
-# Manual serializer to avoid Pydantic for responses
 
-def serialize_poll(poll: models.Poll) -> dict:
-    now = datetime.now(timezone.utc)
-    expired = False
+# Attempts at inserting a poll before giving up on slug collisions with concurrent creators
+_SLUG_INSERT_ATTEMPTS = 3
+# Runs of anything outside [a-z0-9] collapse to a single "-" when slugifying
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+# Characters for random short codes when a requested slug has nothing usable
+_SLUG_ALPHABET = string.ascii_lowercase + string.digits
+
+
+def parse_dt(v):
+    """
+    Parse an optional ISO datetime string from the admin UI; invalid values become None. Values
+    without an offset are taken as UTC, so end_time is always timezone-aware.
+    """
+    if not v:
+        return None
     try:
-        if poll.end_time is not None:
-            expired = (poll.end_time <= now)
+        dt = datetime.fromisoformat(v.replace("Z", "+00:00"))
     except Exception:
-        expired = False
+        return None
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _poll_query(db_session: Session):
+    """
+    Poll query with the questions -> choices tree loaded in the same SELECT (LEFT OUTER JOIN)
+    instead of one lazy SELECT per question.
+    """
+    return db_session.query(models.Poll).options(
+        joinedload(models.Poll.questions).joinedload(models.Question.choices)
+    )
+
+
+def _get_poll(db_session: Session, poll_id: int):
+    """Poll by primary key with its questions -> choices; Session.get checks the identity map first."""
+    return db_session.get(
+        models.Poll, poll_id, options=[joinedload(models.Poll.questions).joinedload(models.Question.choices)]
+    )
+
+
+# Manual serializer to avoid Pydantic for responses
+
+def _poll_dict(row, questions: list, now: datetime) -> dict:
+    """
+    Response dict for a poll from its columns; row is a Poll instance or a Row of the same columns.
+    now is taken once by the caller, so list responses don't read the clock per poll.
+    """
+    # Hot path for list_polls: columns always exist on the model, so read them directly
+    # (no getattr defaults). datetimes are left for orjson to encode (see app/responses.py).
+    # end_time is TIMESTAMPTZ (and parse_dt makes input aware), so it compares directly with now.
+    end = row.end_time
+    expired = end is not None and end <= now
     return {
-        "id": poll.id,
-        "title": poll.title,
-        "description": poll.description,
-        "slug": poll.slug,
-        "poll_type": getattr(poll, "poll_type", "trivia"),
-        "is_active": bool(poll.is_active),
-        "archived": bool(getattr(poll, "archived", False)),
-        "expired": bool(expired),
-        "start_time": poll.start_time.isoformat() if poll.start_time else None,
-        "end_time": poll.end_time.isoformat() if poll.end_time else None,
-        "questions": [
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "slug": row.slug,
+        "poll_type": row.poll_type or "trivia",
+        "is_active": row.is_active is True,
+        "archived": row.archived is True,
+        "expired": expired,
+        "start_time": row.start_time,
+        "end_time": end,
+        "questions": questions,
+    }
+
+
+def serialize_poll(poll: models.Poll, now: Optional[datetime] = None) -> dict:
+    return _poll_dict(
+        poll,
+        [
             {
                 "id": q.id,
                 "text": q.text,
-                "choices": [
-                    {"id": c.id, "text": c.text, "is_correct": bool(getattr(c, "is_correct", False))}
-                    for c in q.choices
-                ],
+                "choices": [{"id": c.id, "text": c.text, "is_correct": c.is_correct is True} for c in q.choices],
             }
             for q in poll.questions
         ],
-    }
+        now or datetime.now(timezone.utc),
+    )
 
 
 # ---------- Simple JSON Authentication ----------
@@ -52,7 +109,7 @@ class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", responses={200: {"model": schemas.Token}})
 def login(login_req: LoginRequest, db_session: Session = Depends(db.get_db)):
     """
     Authenticate against the database first; fallback to .env credentials.
@@ -67,7 +124,7 @@ def login(login_req: LoginRequest, db_session: Session = Depends(db.get_db)):
     )
     if user and auth.verify_password(login_req.password, user.hashed_password):
         access_token = auth.create_access_token(data={"sub": user.username})
-        return {"access_token": access_token, "token_type": "bearer"}
+        return ORJSONUTCResponse({"access_token": access_token, "token_type": "bearer"})
 
     # Fallback to .env admin credentials
     if (
@@ -91,17 +148,17 @@ def login(login_req: LoginRequest, db_session: Session = Depends(db.get_db)):
             db_session.commit()
             db_session.refresh(existing)
         access_token = auth.create_access_token(data={"sub": existing.username})
-        return {"access_token": access_token, "token_type": "bearer"}
+        return ORJSONUTCResponse({"access_token": access_token, "token_type": "bearer"})
 
     raise HTTPException(status_code=400, detail="Incorrect username or password")
 
 
 # ---------- Admin User Creation (initial setup) ----------
-@router.post("/create-admin", response_model=schemas.Token)
+@router.post("/create-admin", responses={200: {"model": schemas.Token}})
 def create_admin(
     user_in: schemas.UserCreate,
     db_session: Session = Depends(db.get_db),
-    current_admin: models.User = Depends(auth.get_current_admin_user),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
 ):
     existing = db_session.query(models.User).filter(models.User.username == user_in.username).first()
     if existing:
@@ -110,192 +167,214 @@ def create_admin(
     admin_user = models.User(username=user_in.username, hashed_password=hashed_password, is_admin=True)
     db_session.add(admin_user)
     db_session.commit()
-    db_session.refresh(admin_user)
-    access_token = auth.create_access_token(data={"sub": admin_user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = auth.create_access_token(data={"sub": user_in.username})
+    return ORJSONUTCResponse({"access_token": access_token, "token_type": "bearer"})
 
 
 # ---------- Poll Management ----------
+# Plain def: the inserts below are blocking psycopg2 calls and must run in the threadpool, not on the
+# event loop (as an async def reading request.json() this stalled every other request meanwhile).
 @router.post("/polls")
-async def create_poll(
-    request: Request,
-    current_admin: models.User = Depends(auth.get_current_admin_user),
+def create_poll(
+    payload: dict = Body(...),
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
 ):
-    db_session = db.SessionLocal()
-    try:
-        payload = await request.json()
-
-        title = (payload.get("title") or "").strip()
-        description = payload.get("description")
-        poll_type = (payload.get("poll_type") or "trivia").strip().lower()
-        start_time = payload.get("start_time")
-        end_time = payload.get("end_time")
-        questions = payload.get("questions", [])
-        requested_slug = (payload.get("slug") or "").strip().lower() or None
-
-        if not title:
-            raise HTTPException(status_code=400, detail="Title is required")
-
-        admin_user = db_session.query(models.User).filter(models.User.is_admin == True).first()
-        created_by = admin_user.id if admin_user else 0
-
-        # Parse datetimes if provided (ISO strings)
-        from datetime import datetime
-        def parse_dt(v):
-            if not v:
-                return None
-            try:
-                return datetime.fromisoformat(v.replace("Z", "+00:00"))
-            except Exception:
-                return None
-
-        # Generate or validate slug (supports custom short code)
-        import re, random, string
-        def unique_slug(base: str) -> str:
-            s = base or f"poll-{int(datetime.utcnow().timestamp())}"
-            i = 2
-            while db_session.query(models.Poll).filter(models.Poll.slug == s).first():
-                s = f"{base}-{i}"
-                i += 1
-            return s
-
-        if requested_slug:
-            base_slug = re.sub(r"[^a-z0-9]+", "-", requested_slug.lower()).strip("-")
-            base_slug = base_slug or ''.join(random.choices(string.ascii_lowercase + string.digits, k=5))
-            slug = unique_slug(base_slug)
-        else:
-            base_slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
-            slug = unique_slug(base_slug)
-
-        poll = models.Poll(
-            title=title,
-            description=description,
-            slug=slug,
-            poll_type=poll_type,
-            is_active=False,
-            start_time=parse_dt(start_time),
-            end_time=parse_dt(end_time),
-            created_by=created_by,
-        )
-        db_session.add(poll)
-        db_session.flush()
-
-        for q in questions:
-            q_text = (q.get("text") or "").strip()
-            if not q_text:
-                continue
-            question = models.Question(poll_id=poll.id, text=q_text)
-            db_session.add(question)
-            db_session.flush()
-            for c in q.get("choices", []):
+    title = (payload.get("title") or "").strip()
+    description = payload.get("description")
+    poll_type = (payload.get("poll_type") or "trivia").strip().lower()
+    start_time = payload.get("start_time")
+    end_time = payload.get("end_time")
+    questions = payload.get("questions", [])
+    requested_slug = (payload.get("slug") or "").strip().lower() or None
+
+    if not title:
+        raise HTTPException(status_code=400, detail="Title is required")
+
+    # Generate or validate slug (supports custom short code)
+    def unique_slug(base: str) -> str:
+        base = base or f"poll-{int(datetime.now(timezone.utc).timestamp())}"
+        # One prefix query (base is [a-z0-9-] only, so no LIKE escaping needed) instead of a SELECT per collision
+        taken = {
+            s for (s,) in db_session.query(models.Poll.slug).filter(models.Poll.slug.like(f"{base}%")).all()
+        }
+        s = base
+        i = 2
+        while s in taken:
+            s = f"{base}-{i}"
+            i += 1
+        return s
+
+    if requested_slug:
+        base_slug = _SLUG_RE.sub("-", requested_slug.lower()).strip("-")
+        base_slug = base_slug or ''.join(random.choices(_SLUG_ALPHABET, k=5))
+        slug = unique_slug(base_slug)
+    else:
+        base_slug = _SLUG_RE.sub("-", title.lower()).strip("-")
+        slug = unique_slug(base_slug)
+
+    poll = models.Poll(
+        title=title,
+        description=description,
+        slug=slug,
+        poll_type=poll_type,
+        is_active=False,
+        start_time=parse_dt(start_time),
+        end_time=parse_dt(end_time),
+        # The authenticated admin (already resolved by require_admin), not a users lookup
+        created_by=current_admin.id,
+    )
+    # The unique index on polls.slug is the real guard: a concurrent creator may take the slug
+    # between the lookup and the INSERT, so retry with a fresh suffix inside a savepoint.
+    for attempt in range(_SLUG_INSERT_ATTEMPTS):
+        try:
+            with db_session.begin_nested():
+                db_session.add(poll)
+                db_session.flush()
+            break
+        except IntegrityError:
+            if attempt == _SLUG_INSERT_ATTEMPTS - 1:
+                raise HTTPException(status_code=409, detail="Could not allocate a unique slug; please retry")
+            poll.slug = unique_slug(base_slug)
+
+    # Bulk INSERTs: all questions in one statement (ids come back in input order via RETURNING),
+    # then all choices in one statement, instead of an add+flush round-trip per row. The response is
+    # built from the inserted values, so nothing is re-read after the commit.
+    question_rows = []
+    question_choices = []
+    for q in questions:
+        q_text = (q.get("text") or "").strip()
+        if not q_text:
+            continue
+        question_rows.append({"poll_id": poll.id, "text": q_text})
+        question_choices.append(q.get("choices", []))
+
+    questions_out = []
+    if question_rows:
+        question_ids = db_session.scalars(
+            insert(models.Question).returning(models.Question.id, sort_by_parameter_order=True),
+            question_rows,
+        ).all()
+        choice_rows = []
+        choice_owners = []
+        for question_id, row, choices in zip(question_ids, question_rows, question_choices):
+            q_out = {"id": question_id, "text": row["text"], "choices": []}
+            questions_out.append(q_out)
+            for c in choices:
                 c_text = (c.get("text") or "").strip()
                 if not c_text:
                     continue
                 is_correct = bool(c.get("is_correct", False)) if poll_type in ("trivia", "poll") else False
-                choice = models.Choice(question_id=question.id, text=c_text, is_correct=is_correct)
-                db_session.add(choice)
-
-        db_session.commit()
-        db_session.refresh(poll)
-        return serialize_poll(poll)
-    finally:
-        db_session.close()
+                choice_rows.append({"question_id": question_id, "text": c_text, "is_correct": is_correct})
+                choice_owners.append(q_out["choices"])
+        if choice_rows:
+            choice_ids = db_session.scalars(
+                insert(models.Choice).returning(models.Choice.id, sort_by_parameter_order=True),
+                choice_rows,
+            ).all()
+            for choice_id, row, owner in zip(choice_ids, choice_rows, choice_owners):
+                owner.append({"id": choice_id, "text": row["text"], "is_correct": row["is_correct"]})
+
+    # Read the poll's columns before commit() expires them
+    data = _poll_dict(poll, questions_out, datetime.now(timezone.utc))
+    db_session.commit()
+    return ORJSONUTCResponse(data)
 
 
 @router.delete("/polls/{poll_id}")
-def delete_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    """Robustly delete a poll and all related data via SQL (votes -> participants/choices -> questions -> poll)."""
-    db_session = db.SessionLocal()
-    try:
-        exists = db_session.query(models.Poll.id).filter(models.Poll.id == poll_id).first()
-        if not exists:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        with db.engine.begin() as conn:
-            # Delete votes linked via participants for this poll
-            conn.execute(text(
-                """
-                DELETE FROM votes
-                WHERE participant_id IN (
-                    SELECT id FROM participants WHERE poll_id = :pid
-                )
-                """
-            ), {"pid": poll_id})
-            # Delete votes linked via choices for this poll
-            conn.execute(text(
-                """
-                DELETE FROM votes v
-                USING choices c, questions q
-                WHERE v.choice_id = c.id AND c.question_id = q.id AND q.poll_id = :pid
-                """
-            ), {"pid": poll_id})
-            # Delete participants for this poll
-            conn.execute(text("DELETE FROM participants WHERE poll_id = :pid"), {"pid": poll_id})
-            # Delete choices for this poll (via questions)
-            conn.execute(text(
-                """
-                DELETE FROM choices
-                WHERE question_id IN (SELECT id FROM questions WHERE poll_id = :pid)
-                """
-            ), {"pid": poll_id})
-            # Delete questions for this poll
-            conn.execute(text("DELETE FROM questions WHERE poll_id = :pid"), {"pid": poll_id})
-            # Finally delete the poll
-            conn.execute(text("DELETE FROM polls WHERE id = :pid"), {"pid": poll_id})
-        return {"detail": "Poll deleted"}
-    finally:
-        db_session.close()
+def delete_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    """Delete a poll; questions, choices, participants and votes go with it via ON DELETE CASCADE."""
+    res = db_session.execute(delete(models.Poll).where(models.Poll.id == poll_id))
+    if res.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll deleted"}
 
 
 @router.get("/polls")
-def list_polls(current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        polls = db_session.query(models.Poll).all()
-        return [serialize_poll(p) for p in polls]
-    finally:
-        db_session.close()
+def list_polls(
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    # Hot list endpoint: three column-only SELECTs grouped in one pass each, no ORM instances or
+    # identity map, then encoded straight to bytes (skipping jsonable_encoder entirely)
+    polls = db_session.execute(
+        select(
+            models.Poll.id,
+            models.Poll.title,
+            models.Poll.description,
+            models.Poll.slug,
+            models.Poll.poll_type,
+            models.Poll.is_active,
+            models.Poll.archived,
+            models.Poll.start_time,
+            models.Poll.end_time,
+        ).order_by(models.Poll.id)
+    ).all()
+    choices_by_question = defaultdict(list)
+    for c in db_session.execute(
+        select(models.Choice.id, models.Choice.question_id, models.Choice.text, models.Choice.is_correct)
+        .order_by(models.Choice.id)
+    ):
+        choices_by_question[c.question_id].append({"id": c.id, "text": c.text, "is_correct": c.is_correct is True})
+    questions_by_poll = defaultdict(list)
+    for q in db_session.execute(
+        select(models.Question.id, models.Question.poll_id, models.Question.text).order_by(models.Question.id)
+    ):
+        questions_by_poll[q.poll_id].append({"id": q.id, "text": q.text, "choices": choices_by_question[q.id]})
+    now = datetime.now(timezone.utc)
+    return ORJSONUTCResponse([_poll_dict(p, questions_by_poll[p.id], now) for p in polls])
 
 
 @router.get("/polls/{poll_id}")
-def get_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        return serialize_poll(poll)
-    finally:
-        db_session.close()
+def get_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    poll = _get_poll(db_session, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    return ORJSONUTCResponse(serialize_poll(poll))
 
 
 @router.post("/polls/{poll_id}/activate")
-def activate_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        poll.is_active = True
-        poll.start_time = datetime.utcnow()
-        db_session.commit()
-        return {"detail": "Poll activated"}
-    finally:
-        db_session.close()
+def activate_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    # Single UPDATE; rowcount doubles as the existence check
+    res = db_session.execute(
+        update(models.Poll).where(models.Poll.id == poll_id).values(is_active=True, start_time=func.now())
+    )
+    if res.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll activated"}
 
 
 @router.post("/polls/{poll_id}/deactivate")
-def deactivate_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        poll.is_active = False
-        poll.end_time = datetime.utcnow()
-        db_session.commit()
-        return {"detail": "Poll deactivated"}
-    finally:
-        db_session.close()
+def deactivate_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    # Single UPDATE; rowcount doubles as the existence check
+    res = db_session.execute(
+        update(models.Poll).where(models.Poll.id == poll_id).values(is_active=False, end_time=func.now())
+    )
+    if res.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll deactivated"}
 
 
 # ---------- Reactivate with duration ----------
@@ -306,232 +385,284 @@ class ReactivateRequest(BaseModel):
 def reactivate_poll(
     poll_id: int,
     req: ReactivateRequest,
-    current_admin: models.User = Depends(auth.get_current_admin_user),
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
 ):
-    db_session = db.SessionLocal()
+    poll = db_session.get(models.Poll, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    # Clamp minutes to at least 1
+    minutes = 1
     try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        # Clamp minutes to at least 1
-        minutes = 1
-        try:
-            minutes = max(1, int(getattr(req, 'minutes', 2) or 2))
-        except Exception:
-            minutes = 2
-        now = datetime.utcnow()
-        from datetime import timedelta
-        poll.is_active = True
-        poll.archived = False
-        poll.start_time = now
-        poll.end_time = now + timedelta(minutes=minutes)
-        db_session.commit()
-        db_session.refresh(poll)
-        return serialize_poll(poll)
-    finally:
-        db_session.close()
+        minutes = max(1, int(getattr(req, 'minutes', 2) or 2))
+    except Exception:
+        minutes = 2
+    now = datetime.now(timezone.utc)
+    poll.is_active = True
+    poll.archived = False
+    poll.start_time = now
+    poll.end_time = now + timedelta(minutes=minutes)
+    db_session.commit()
+    cache.invalidate_public()
+    poll = _poll_query(db_session).filter(models.Poll.id == poll.id).one()
+    return ORJSONUTCResponse(serialize_poll(poll))
 
 @router.post("/polls/{poll_id}/archive")
-def archive_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        poll.archived = True
-        poll.is_active = False
-        if not poll.end_time:
-            poll.end_time = datetime.utcnow()
-        db_session.commit()
-        return {"detail": "Poll archived"}
-    finally:
-        db_session.close()
+def archive_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    res = db_session.execute(
+        update(models.Poll)
+        .where(models.Poll.id == poll_id)
+        .values(archived=True, is_active=False, end_time=func.coalesce(models.Poll.end_time, func.now()))
+    )
+    if res.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll archived"}
 
 @router.post("/polls/{poll_id}/unarchive")
-def unarchive_poll(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        poll.archived = False
-        db_session.commit()
-        return {"detail": "Poll unarchived"}
-    finally:
-        db_session.close()
+def unarchive_poll(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    res = db_session.execute(update(models.Poll).where(models.Poll.id == poll_id).values(archived=False))
+    if res.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll unarchived"}
 
 # Activate/Deactivate by slug (code)
 @router.post("/polls/by-slug/{slug}/activate")
-def activate_poll_by_slug(slug: str, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(func.lower(models.Poll.slug) == func.lower(slug)).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found for slug")
-        poll.is_active = True
-        poll.start_time = datetime.utcnow()
-        db_session.commit()
-        return {"detail": "Poll activated", "id": poll.id}
-    finally:
-        db_session.close()
+def activate_poll_by_slug(
+    slug: str,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    # UPDATE ... RETURNING id: one round-trip for the lookup, the change and the response id
+    poll_id = db_session.execute(
+        update(models.Poll)
+        .where(func.lower(models.Poll.slug) == slug.lower())
+        .values(is_active=True, start_time=func.now())
+        .returning(models.Poll.id)
+    ).scalar()
+    if poll_id is None:
+        raise HTTPException(status_code=404, detail="Poll not found for slug")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll activated", "id": poll_id}
 
 @router.post("/polls/by-slug/{slug}/deactivate")
-def deactivate_poll_by_slug(slug: str, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(func.lower(models.Poll.slug) == func.lower(slug)).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found for slug")
-        poll.is_active = False
-        poll.end_time = datetime.utcnow()
-        db_session.commit()
-        return {"detail": "Poll deactivated", "id": poll.id}
-    finally:
-        db_session.close()
+def deactivate_poll_by_slug(
+    slug: str,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    # UPDATE ... RETURNING id: one round-trip for the lookup, the change and the response id
+    poll_id = db_session.execute(
+        update(models.Poll)
+        .where(func.lower(models.Poll.slug) == slug.lower())
+        .values(is_active=False, end_time=func.now())
+        .returning(models.Poll.id)
+    ).scalar()
+    if poll_id is None:
+        raise HTTPException(status_code=404, detail="Poll not found for slug")
+    db_session.commit()
+    cache.invalidate_public()
+    return {"detail": "Poll deactivated", "id": poll_id}
+
+
+def _vote_counts(db_session: Session, choice_ids: list) -> dict:
+    """
+    {choice_id: votes} from one GROUP BY instead of a COUNT per choice. Choices without votes are
+    absent. That is also the empty-poll case, so an EXISTS probe first would only add a round-trip;
+    without any choice ids the query is skipped altogether.
+    """
+    if not choice_ids:
+        return {}
+    return dict(
+        db_session.query(models.Vote.choice_id, func.count())
+        .filter(models.Vote.choice_id.in_(choice_ids))
+        .group_by(models.Vote.choice_id)
+        .all()
+    )
 
 
 # ---------- CSV Export ----------
 @router.get("/polls/{poll_id}/export.csv")
-def export_poll_csv(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        # Compute per-question summaries
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["poll_id","title","type","question_index","question_id","question_text","choice_id","choice_text","votes","percent","is_correct"]) 
-        for idx, question in enumerate(poll.questions, start=1):
-            choices = question.choices
-            # total votes for question
-            total_votes = sum(db_session.query(models.Vote).filter(models.Vote.choice_id == c.id).count() for c in choices) or 1
-            for c in choices:
-                count = db_session.query(models.Vote).filter(models.Vote.choice_id == c.id).count()
-                pct = round((count / total_votes) * 100)
-                writer.writerow([poll.id, poll.title, getattr(poll, 'poll_type', 'trivia'), idx, question.id, question.text, c.id, c.text, count, pct, bool(getattr(c, 'is_correct', False))])
-        csv_bytes = output.getvalue().encode('utf-8')
-        headers = {"Content-Disposition": f"attachment; filename=poll_{poll_id}_summary.csv"}
-        return Response(content=csv_bytes, media_type="text/csv", headers=headers)
-    finally:
-        db_session.close()
+def export_poll_csv(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    poll = _get_poll(db_session, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    # Compute per-question summaries: one row per choice, so the whole CSV is small and is sent as a
+    # single body (no per-line streaming iteration)
+    rows = [["poll_id","title","type","question_index","question_id","question_text","choice_id","choice_text","votes","percent","is_correct"]]
+    counts = _vote_counts(db_session, [c.id for q in poll.questions for c in q.choices])
+    for idx, question in enumerate(poll.questions, start=1):
+        choices = question.choices
+        # total votes for question
+        total_votes = sum(counts.get(c.id, 0) for c in choices) or 1
+        for c in choices:
+            count = counts.get(c.id, 0)
+            pct = round((count / total_votes) * 100)
+            rows.append([poll.id, poll.title, getattr(poll, 'poll_type', 'trivia'), idx, question.id, question.text, c.id, c.text, count, pct, bool(getattr(c, 'is_correct', False))])
+    headers = {"Content-Disposition": f"attachment; filename=poll_{poll_id}_summary.csv"}
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return Response(content=buf.getvalue(), media_type="text/csv", headers=headers)
 
 
 # ---------- Results ----------
 @router.get("/polls/{poll_id}/results")
-def poll_results(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-
-        results = []
-        for question in poll.questions:
-            q_res = {"question_id": question.id, "question_text": question.text, "choices": []}
-            for choice in question.choices:
-                vote_count = db_session.query(models.Vote).filter(models.Vote.choice_id == choice.id).count()
-                q_res["choices"].append({
-                    "choice_id": choice.id,
-                    "choice_text": choice.text,
-                    "votes": vote_count,
-                    "is_correct": bool(getattr(choice, "is_correct", False))
-                })
-            results.append(q_res)
-
-        return {"poll_id": poll.id, "title": poll.title, "poll_type": getattr(poll, "poll_type", "trivia"), "results": results}
-    finally:
-        db_session.close()
+def poll_results(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    poll = _get_poll(db_session, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+
+    counts = _vote_counts(db_session, [c.id for q in poll.questions for c in q.choices])
+
+    results = []
+    for question in poll.questions:
+        q_res = {"question_id": question.id, "question_text": question.text, "choices": []}
+        for choice in question.choices:
+            q_res["choices"].append({
+                "choice_id": choice.id,
+                "choice_text": choice.text,
+                "votes": counts.get(choice.id, 0),
+                "is_correct": bool(getattr(choice, "is_correct", False))
+            })
+        results.append(q_res)
+
+    data = {"poll_id": poll.id, "title": poll.title, "poll_type": getattr(poll, "poll_type", "trivia"), "results": results}
+    return ORJSONUTCResponse(data)
+
+
+def _question_count(db_session: Session, poll_id: int) -> int:
+    return db_session.query(func.count(models.Question.id)).filter(models.Question.poll_id == poll_id).scalar()
+
+
+def _correct_choice_ids(poll_id: int):
+    """SELECT of the ids of a poll's correct choices (one indexed join instead of walking relationships)."""
+    return (
+        select(models.Choice.id)
+        .join(models.Question, models.Choice.question_id == models.Question.id)
+        .where(models.Question.poll_id == poll_id, models.Choice.is_correct == True)
+    )
+
+
+def _correct_counts_query(db_session: Session, poll_id: int):
+    """(participant_id, name, company, correct_count) for every participant of a poll, aggregated in SQL."""
+    correct_choice_ids = _correct_choice_ids(poll_id)
+    return (
+        db_session.query(
+            models.Participant.id,
+            models.Participant.name,
+            models.Participant.company,
+            func.count(models.Vote.id),
+        )
+        .outerjoin(
+            models.Vote,
+            and_(models.Vote.participant_id == models.Participant.id, models.Vote.choice_id.in_(correct_choice_ids)),
+        )
+        .filter(models.Participant.poll_id == poll_id)
+        .group_by(models.Participant.id)
+    )
 
 
 @router.get("/polls/{poll_id}/winners")
-def poll_winners(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
+def poll_winners(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
     """Compute winners (participants with all answers correct). Only valid for 'trivia' polls."""
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        if getattr(poll, "poll_type", "trivia") != "trivia":
-            raise HTTPException(status_code=400, detail="Winners are only applicable for trivia polls")
-        total_questions = len(poll.questions)
-        correct_choice_ids = set(
-            c.id for q in poll.questions for c in q.choices if getattr(c, "is_correct", False)
-        )
-        participants = db_session.query(models.Participant).filter(models.Participant.poll_id == poll_id).all()
-        results = []
-        for p in participants:
-            votes = db_session.query(models.Vote).filter(models.Vote.participant_id == p.id).all()
-            correct = sum(1 for v in votes if v.choice_id in correct_choice_ids)
-            results.append({
-                "participant_id": p.id,
-                "name": p.name,
-                "company": p.company,
-                "correct_count": correct,
-                "total_questions": total_questions,
-                "is_winner": (correct == total_questions and total_questions > 0)
-            })
-        winners = [r for r in results if r["is_winner"]]
-        return {"poll_id": poll.id, "title": poll.title, "total_questions": total_questions, "participants": results, "winners": winners}
-    finally:
-        db_session.close()
+    poll = db_session.get(models.Poll, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if getattr(poll, "poll_type", "trivia") != "trivia":
+        raise HTTPException(status_code=400, detail="Winners are only applicable for trivia polls")
+    total_questions = _question_count(db_session, poll_id)
+    results = []
+    for p_id, name, company, correct in _correct_counts_query(db_session, poll_id).order_by(models.Participant.id):
+        results.append({
+            "participant_id": p_id,
+            "name": name,
+            "company": company,
+            "correct_count": correct,
+            "total_questions": total_questions,
+            "is_winner": (correct == total_questions and total_questions > 0)
+        })
+    winners = [r for r in results if r["is_winner"]]
+    return {"poll_id": poll.id, "title": poll.title, "total_questions": total_questions, "participants": results, "winners": winners}
 
 
 @router.get("/polls/{poll_id}/leaderboard")
-def trivia_leaderboard(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
+def trivia_leaderboard(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
     """Return trivia leaderboard sorted by correct answers desc (and timestamp asc)."""
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        if getattr(poll, "poll_type", "trivia") != "trivia":
-            raise HTTPException(status_code=400, detail="Leaderboard is only applicable for trivia polls")
-        total_questions = len(poll.questions)
-        correct_choice_ids = set(c.id for q in poll.questions for c in q.choices if getattr(c, "is_correct", False))
-        participants = db_session.query(models.Participant).filter(models.Participant.poll_id == poll_id).all()
-        rows = []
-        for p in participants:
-            votes = db_session.query(models.Vote).filter(models.Vote.participant_id == p.id).all()
-            correct = sum(1 for v in votes if v.choice_id in correct_choice_ids)
-            rows.append({
-                "participant_id": p.id,
-                "name": p.name,
-                "company": p.company,
-                "correct_count": correct,
-                "total_questions": total_questions,
-                "percent": (round((correct / total_questions) * 100) if total_questions else 0)
-            })
-        # Sort by correct desc, then name asc
-        rows.sort(key=lambda r: (-r["correct_count"], (r["name"] or "")))
-        return {"poll_id": poll.id, "title": poll.title, "rows": rows}
-    finally:
-        db_session.close()
+    poll = db_session.get(models.Poll, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if getattr(poll, "poll_type", "trivia") != "trivia":
+        raise HTTPException(status_code=400, detail="Leaderboard is only applicable for trivia polls")
+    total_questions = _question_count(db_session, poll_id)
+    # Correct answers per participant come from one aggregate query instead of a votes SELECT each
+    rows = []
+    for p_id, name, company, correct in _correct_counts_query(db_session, poll_id).order_by(models.Participant.id):
+        rows.append({
+            "participant_id": p_id,
+            "name": name,
+            "company": company,
+            "correct_count": correct,
+            "total_questions": total_questions,
+            "percent": (round((correct / total_questions) * 100) if total_questions else 0)
+        })
+    # Sort by correct desc, then name asc
+    rows.sort(key=lambda r: (-r["correct_count"], (r["name"] or "")))
+    return {"poll_id": poll.id, "title": poll.title, "rows": rows}
 
 
 @router.post("/polls/{poll_id}/pick-winner")
-def pick_random_winner(poll_id: int, current_admin: models.User = Depends(auth.get_current_admin_user)):
-    db_session = db.SessionLocal()
-    try:
-        poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id).first()
-        if not poll:
-            raise HTTPException(status_code=404, detail="Poll not found")
-        if getattr(poll, "poll_type", "trivia") != "trivia":
-            raise HTTPException(status_code=400, detail="Picking a winner is only applicable for trivia polls")
-        total_questions = len(poll.questions)
-        correct_choice_ids = set(
-            c.id for q in poll.questions for c in q.choices if getattr(c, "is_correct", False)
+def pick_random_winner(
+    poll_id: int,
+    db_session: Session = Depends(db.get_db),
+    current_admin: auth.CurrentUser = Depends(auth.require_admin),
+):
+    poll = db_session.get(models.Poll, poll_id)
+    if not poll:
+        raise HTTPException(status_code=404, detail="Poll not found")
+    if getattr(poll, "poll_type", "trivia") != "trivia":
+        raise HTTPException(status_code=400, detail="Picking a winner is only applicable for trivia polls")
+    total_questions = _question_count(db_session, poll_id)
+    # Filter to perfect scores and sample in the database; the window count runs after HAVING
+    row = None
+    if total_questions > 0:
+        correct = func.count(models.Vote.id)
+        row = (
+            _correct_counts_query(db_session, poll_id)
+            .add_columns(func.count().over())
+            .having(correct == total_questions)
+            .order_by(func.random())
+            .limit(1)
+            .first()
         )
-        participants = db_session.query(models.Participant).filter(models.Participant.poll_id == poll_id).all()
-        winners = []
-        for p in participants:
-            votes = db_session.query(models.Vote).filter(models.Vote.participant_id == p.id).all()
-            correct = sum(1 for v in votes if v.choice_id in correct_choice_ids)
-            if correct == total_questions and total_questions > 0:
-                winners.append({"participant_id": p.id, "name": p.name, "company": p.company})
-        if not winners:
-            raise HTTPException(status_code=400, detail="No winners found")
-        selected = random.choice(winners)
-        return {"winner": selected, "count": len(winners)}
-    finally:
-        db_session.close()
\ No newline at end of file
+    if row is None:
+        raise HTTPException(status_code=400, detail="No winners found")
+    p_id, name, company, _, winner_count = row
+    return {"winner": {"participant_id": p_id, "name": name, "company": company}, "count": winner_count}
\ No newline at end of file
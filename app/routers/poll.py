@@ -1,174 +1,264 @@
+import zlib
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import bindparam, func, insert, or_, select
 from datetime import datetime, timezone
 
-from .. import models, schemas, db
+from .. import models, schemas, db, cache, responses
+from ..responses import ORJSONUTCResponse
 
-router = APIRouter()
+# Responses are built from our own rows by serialize_public_poll, so there is no response_model to
+# re-validate them; schemas.PollRead is still documented via responses=.
+router = APIRouter(default_response_class=ORJSONUTCResponse)
+_POLL_DOC = {200: {"model": schemas.PollRead}}
+_POLL_LIST_DOC = {200: {"model": List[schemas.PollRead]}}
+# questions -> choices in two batched SELECTs, whatever the number of polls, instead of lazy loads
+_POLL_TREE = selectinload(models.Poll.questions).selectinload(models.Question.choices)
+_UTC = timezone.utc
 
 
-# ---------- Public Endpoints ----------
-@router.get("/active", response_model=List[schemas.PollRead])
-def get_active_polls(type: Optional[str] = None, db_session: Session = Depends(db.get_db)):
-    q = db_session.query(models.Poll).filter(models.Poll.is_active == True, models.Poll.archived == False)
+# Attendee-visible polls with their questions/choices, built once at import; the type-filtered
+# variant binds :type (lowercased by the caller) instead of branching and rebuilding per request
+_ACTIVE = (
+    select(models.Poll)
+    .options(_POLL_TREE)
+    .where(models.Poll.is_active == True, models.Poll.archived == False)
+)
+_ACTIVE_BY_TYPE = _ACTIVE.where(func.lower(models.Poll.poll_type) == bindparam("type"))
+
+
+def _active_lookup(column):
+    """
+    Module-level SELECT of one active, unarchived poll by lower(column) = :value, built once at import
+    instead of per request. Returns (any type, type-filtered) variants; bind value (and type) lowercased.
+    """
+    stmt = _ACTIVE.where(func.lower(column) == bindparam("value")).limit(1)
+    return stmt, stmt.where(func.lower(models.Poll.poll_type) == bindparam("type"))
+
+
+_BY_TITLE, _BY_TITLE_TYPED = _active_lookup(models.Poll.title)
+_BY_SLUG, _BY_SLUG_TYPED = _active_lookup(models.Poll.slug)
+
+
+def _first_active(db_session: Session, stmt, typed_stmt, value: str, type: Optional[str]):
     if type:
-        q = q.filter(func.lower(models.Poll.poll_type) == func.lower(type))
-    return q.all()
+        return db_session.scalars(typed_stmt, {"value": value.lower(), "type": type.lower()}).first()
+    return db_session.scalars(stmt, {"value": value.lower()}).first()
+
+
+def serialize_public_poll(poll: models.Poll, now: Optional[datetime] = None) -> dict:
+    """
+    Attendee view of a poll (schemas.PollRead shape): never includes is_correct. Carries the same
+    archived/expired flags as /status/*, so a client holding the poll needs no second request for them.
+    """
+    now = now or datetime.now(_UTC)
+    return {
+        "id": poll.id,
+        "title": poll.title,
+        "description": poll.description,
+        "poll_type": poll.poll_type,
+        "is_active": poll.is_active is True,
+        "archived": poll.archived is True,
+        "expired": poll.end_time is not None and poll.end_time <= now,
+        "start_time": poll.start_time,
+        "end_time": poll.end_time,
+        "questions": [
+            {"id": q.id, "text": q.text, "choices": [{"id": c.id, "text": c.text} for c in q.choices]}
+            for q in poll.questions
+        ],
+    }
+
+
+# ---------- Public Endpoints ----------
+@router.get("/active", responses=_POLL_LIST_DOC)
+def get_active_polls(request: Request, type: Optional[str] = None, db_session: Session = Depends(db.get_db)):
+    # Hit on every attendee page load: serve the encoded body from a short TTL cache (see app/cache.py)
+    key = ("active", type.lower() if type else None)
+    body = cache.get_public(key)
+    if body is None:
+        if type:
+            polls = db_session.scalars(_ACTIVE_BY_TYPE, {"type": type.lower()}).all()
+        else:
+            polls = db_session.scalars(_ACTIVE).all()
+        now = datetime.now(_UTC)
+        body = responses.dumps([serialize_public_poll(p, now) for p in polls])
+        cache.put_public(key, body)
+    etag = responses.body_etag(body)
+    return responses.not_modified(request, etag) or Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
 
 
 # Important: declare the static route before the dynamic one to avoid 422 due to path matching
-@router.get("/by-title", response_model=schemas.PollRead)
+@router.get("/by-title", responses=_POLL_DOC)
 def get_poll_by_title(title: str, type: Optional[str] = None, db_session: Session = Depends(db.get_db)):
-    q = (
-        db_session.query(models.Poll)
-        .filter(
-            models.Poll.is_active == True,
-            models.Poll.archived == False,
-            func.lower(models.Poll.title) == func.lower(title),
-        )
-    )
-    if type:
-        q = q.filter(func.lower(models.Poll.poll_type) == func.lower(type))
-    poll = q.first()
+    poll = _first_active(db_session, _BY_TITLE, _BY_TITLE_TYPED, title, type)
     if not poll:
         raise HTTPException(status_code=404, detail="Active poll not found for given title")
-    return poll
+    return ORJSONUTCResponse(serialize_public_poll(poll))
 
 
-@router.get("/by-slug", response_model=schemas.PollRead)
+@router.get("/by-slug", responses=_POLL_DOC)
 def get_poll_by_slug(slug: str, type: Optional[str] = None, db_session: Session = Depends(db.get_db)):
-    q = db_session.query(models.Poll).filter(models.Poll.is_active == True, models.Poll.archived == False, func.lower(models.Poll.slug) == func.lower(slug))
-    if type:
-        q = q.filter(func.lower(models.Poll.poll_type) == func.lower(type))
-    poll = q.first()
-    if not poll:
-        raise HTTPException(status_code=404, detail="Active poll not found for given slug")
-    return poll
+    # Every attendee joining via a code lands here at once; cache hits skip the DB (404s are not cached)
+    key = ("slug", slug.lower(), type.lower() if type else None)
+    body = cache.get_public(key)
+    if body is None:
+        poll = _first_active(db_session, _BY_SLUG, _BY_SLUG_TYPED, slug, type)
+        if not poll:
+            raise HTTPException(status_code=404, detail="Active poll not found for given slug")
+        body = responses.dumps(serialize_public_poll(poll))
+        cache.put_public(key, body)
+    return Response(content=body, media_type="application/json")
+
+# Lightweight status endpoints to inform UI about closed/expired items. They are polled by the UI, so
+# answers for existing polls come from a short TTL cache (see app/cache.py); a miss selects just the
+# reported columns as a tuple. Clients whose ETag (built from those columns) still matches get a 304.
+def _status_lookup(column):
+    """Module-level status SELECT by lower(column) = :value (lowercased by the caller), built once."""
+    return (
+        select(
+            models.Poll.id,
+            models.Poll.title,
+            models.Poll.poll_type,
+            models.Poll.is_active,
+            models.Poll.archived,
+            models.Poll.end_time,
+        )
+        .where(func.lower(column) == bindparam("value"))
+        .limit(1)
+    )
+
+
+_STATUS_BY_SLUG = _status_lookup(models.Poll.slug)
+_STATUS_BY_TITLE = _status_lookup(models.Poll.title)
+
+
+def _poll_status(request: Request, db_session: Session, stmt, kind: str, value: str):
+    key = (kind, value.lower())
+    hit = cache.get_status(key)
+    if hit is None:
+        row = db_session.execute(stmt, {"value": value.lower()}).first()
+        if row is None:
+            return ORJSONUTCResponse({"exists": False})
+        # end_time is TIMESTAMPTZ, so it compares directly with an aware now
+        expired = row.end_time is not None and row.end_time <= datetime.now(_UTC)
+        etag = responses.weak_etag(
+            row.id, zlib.crc32(row.title.encode()), row.poll_type, int(bool(row.is_active)),
+            int(bool(row.archived)), int(expired),
+        )
+        body = responses.dumps(
+            {
+                "exists": True,
+                "id": row.id,
+                "title": row.title,
+                "poll_type": row.poll_type,
+                "is_active": bool(row.is_active),
+                "archived": bool(row.archived),
+                "expired": expired,
+            }
+        )
+        hit = (etag, body)
+        cache.put_status(key, etag, body)
+    etag, body = hit
+    return responses.not_modified(request, etag) or Response(
+        content=body, media_type="application/json", headers={"ETag": etag}
+    )
+
 
-# Lightweight status endpoints to inform UI about closed/expired items
 @router.get("/status/by-slug")
-def get_status_by_slug(slug: str, db_session: Session = Depends(db.get_db)):
-    poll = db_session.query(models.Poll).filter(func.lower(models.Poll.slug) == func.lower(slug)).first()
-    if not poll:
-        return {"exists": False}
-    now = datetime.now(timezone.utc)
-    expired = False
-    try:
-        if poll.end_time is not None:
-            expired = (poll.end_time <= now)
-    except Exception:
-        expired = False
-    return {
-        "exists": True,
-        "id": poll.id,
-        "title": poll.title,
-        "poll_type": getattr(poll, "poll_type", "trivia"),
-        "is_active": bool(poll.is_active),
-        "archived": bool(getattr(poll, "archived", False)),
-        "expired": bool(expired),
-    }
+def get_status_by_slug(request: Request, slug: str, db_session: Session = Depends(db.get_db)):
+    return _poll_status(request, db_session, _STATUS_BY_SLUG, "slug", slug)
+
 
 @router.get("/status/by-title")
-def get_status_by_title(title: str, db_session: Session = Depends(db.get_db)):
-    poll = (
-        db_session.query(models.Poll)
-        .filter(func.lower(models.Poll.title) == func.lower(title))
-        .first()
-    )
-    if not poll:
-        return {"exists": False}
-    now = datetime.now(timezone.utc)
-    expired = False
-    try:
-        if poll.end_time is not None:
-            expired = (poll.end_time <= now)
-    except Exception:
-        expired = False
-    return {
-        "exists": True,
-        "id": poll.id,
-        "title": poll.title,
-        "poll_type": getattr(poll, "poll_type", "trivia"),
-        "is_active": bool(poll.is_active),
-        "archived": bool(getattr(poll, "archived", False)),
-        "expired": bool(expired),
-    }
+def get_status_by_title(request: Request, title: str, db_session: Session = Depends(db.get_db)):
+    return _poll_status(request, db_session, _STATUS_BY_TITLE, "title", title)
 
 
-@router.get("/{poll_id}", response_model=schemas.PollRead)
+@router.get("/{poll_id}", responses=_POLL_DOC)
 def get_poll(poll_id: int, db_session: Session = Depends(db.get_db)):
-    poll = db_session.query(models.Poll).filter(models.Poll.id == poll_id, models.Poll.is_active == True, models.Poll.archived == False).first()
-    if not poll:
+    poll = db_session.get(models.Poll, poll_id, options=[_POLL_TREE])
+    if poll is None or not poll.is_active or poll.archived:
         raise HTTPException(status_code=404, detail="Active poll not found")
-    return poll
+    return ORJSONUTCResponse(serialize_public_poll(poll))
 
 
 # ---------- Vote Submission ----------
+# INSERT ... SELECT that creates the participant only if the poll is active, not archived and not past
+# its end_time. The database checks and writes in one statement (no fetch-then-check window); Core
+# table, as for votes, so the ORM does not treat the bound parameters as a bulk insert.
+_JOIN_OPEN_POLL = (
+    insert(models.Participant.__table__)
+    .from_select(
+        ["name", "company", "poll_id"],
+        select(
+            bindparam("name", type_=models.Participant.name.type),
+            bindparam("company", type_=models.Participant.company.type),
+            models.Poll.id,
+        ).where(
+            models.Poll.id == bindparam("poll_id"),
+            models.Poll.is_active == True,
+            models.Poll.archived == False,
+            or_(models.Poll.end_time.is_(None), models.Poll.end_time > func.now()),
+        ),
+    )
+    .returning(models.Participant.__table__.c.id)
+)
+
 @router.post("/{poll_id}/submit", status_code=201)
 def submit_votes(
     poll_id: int,
     vote_data: schemas.VoteSubmit,
     db_session: Session = Depends(db.get_db),
 ):
-    poll = (
-        db_session.query(models.Poll)
-        .filter(
-            models.Poll.id == poll_id,
-            models.Poll.is_active == True,
-            models.Poll.archived == False,
-        )
-        .first()
-    )
-    if not poll:
+    # Cutoff first: the participant row is only inserted while the poll is open; no row back means it is not
+    participant_id = db_session.execute(
+        _JOIN_OPEN_POLL,
+        {"poll_id": poll_id, "name": vote_data.participant.name, "company": vote_data.participant.company},
+    ).scalar()
+    if participant_id is None:
+        # Failure path only: tell an ended session (403) from a missing/inactive poll (404)
+        ended = db_session.execute(
+            select(models.Poll.id).where(
+                models.Poll.id == poll_id, models.Poll.is_active == True, models.Poll.archived == False
+            )
+        ).first()
+        if ended:
+            raise HTTPException(status_code=403, detail="This session has ended. Submissions are closed.")
         raise HTTPException(status_code=404, detail="Active poll not found")
 
-    # Enforce submission cutoff if end_time is set
-    now = datetime.utcnow().replace(tzinfo=timezone.utc)
-    try:
-        if poll.end_time is not None:
-            end = poll.end_time
-            # ensure timezone-aware comparison
-            if end.tzinfo is None:
-                from datetime import timezone as _tz
-                end = end.replace(tzinfo=_tz.utc)
-            if now > end:
-                raise HTTPException(status_code=403, detail="This session has ended. Submissions are closed.")
-    except Exception:
-        # if parsing fails, proceed without blocking
-        pass
-
-    # Create participant record
-    participant = models.Participant(
-        poll_id=poll.id, name=vote_data.participant.name, company=vote_data.participant.company
-    )
-    db_session.add(participant)
-    db_session.flush()  # get participant.id
-
-    # Validate and record each vote
-    for vote in vote_data.votes:
-        # Ensure question belongs to poll
-        question = (
-            db_session.query(models.Question)
-            .filter(models.Question.id == vote.question_id, models.Question.poll_id == poll.id)
-            .first()
-        )
-        if not question:
-            raise HTTPException(status_code=400, detail=f"Invalid question ID {vote.question_id}")
-
-        # Ensure choice belongs to question
-        choice = (
-            db_session.query(models.Choice)
-            .filter(models.Choice.id == vote.choice_id, models.Choice.question_id == question.id)
-            .first()
+    # Validate the submitted (question_id, choice_id) pairs with one IN query over just those choices
+    # (PK lookups), rather than fetching the poll's whole question/choice set; all bad pairs are reported.
+    # Raising here leaves the transaction uncommitted, so get_db's close rolls back the participant row.
+    submitted = {(vote.question_id, vote.choice_id) for vote in vote_data.votes}
+    if submitted:
+        valid_pairs = set(
+            db_session.execute(
+                select(models.Choice.question_id, models.Choice.id)
+                .join(models.Question, models.Question.id == models.Choice.question_id)
+                .where(
+                    models.Choice.id.in_({choice_id for _, choice_id in submitted}),
+                    models.Question.poll_id == poll_id,
+                )
+            ).all()
         )
-        if not choice:
-            raise HTTPException(status_code=400, detail=f"Invalid choice ID {vote.choice_id}")
+        invalid = sorted(submitted - valid_pairs)
+        if invalid:
+            pairs = ", ".join(f"{question_id}/{choice_id}" for question_id, choice_id in invalid)
+            raise HTTPException(status_code=400, detail=f"Invalid question/choice IDs: {pairs}")
 
-        vote_record = models.Vote(participant_id=participant.id, choice_id=choice.id, question_id=question.id)
-        db_session.add(vote_record)
+    # One executemany INSERT on the Core table: no Vote instances, unit of work or identity map
+    if vote_data.votes:
+        db_session.execute(
+            models.Vote.__table__.insert(),
+            [
+                {"participant_id": participant_id, "choice_id": vote.choice_id, "question_id": vote.question_id}
+                for vote in vote_data.votes
+            ],
+        )
 
     db_session.commit()
     return {"detail": "Votes submitted successfully"}
\ No newline at end of file
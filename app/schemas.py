@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 # ---------- Auth ----------
 class Token(BaseModel):
@@ -41,8 +41,7 @@ class ChoiceRead(BaseModel):
     id: int
     text: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class QuestionRead(BaseModel):
@@ -50,8 +49,7 @@ class QuestionRead(BaseModel):
     text: str
     choices: List[ChoiceRead]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class PollRead(BaseModel):
@@ -60,12 +58,13 @@ class PollRead(BaseModel):
     description: Optional[str] = None
     poll_type: str
     is_active: bool
+    archived: bool = False
+    expired: bool = False
     start_time: Optional[datetime] = None
     end_time: Optional[datetime] = None
     questions: List[QuestionRead]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ---------- Participant ----------
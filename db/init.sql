@@ -12,6 +12,11 @@ CREATE TABLE IF NOT EXISTS users (
     is_admin BOOLEAN DEFAULT TRUE
 );
 
+-- Covering index for auth lookups (username -> id, is_admin) as index-only scans
+CREATE INDEX IF NOT EXISTS ix_users_username_covering ON users (username) INCLUDE (id, is_admin);
+-- Partial index for admin-existence checks
+CREATE INDEX IF NOT EXISTS ix_users_admin ON users (id) WHERE is_admin = true;
+
 -- Polls
 CREATE TABLE IF NOT EXISTS polls (
     id SERIAL PRIMARY KEY,
@@ -28,18 +33,25 @@ CREATE TABLE IF NOT EXISTS polls (
 
 -- Ensure unique slug via index (allows NULLs and enforces uniqueness when present)
 CREATE UNIQUE INDEX IF NOT EXISTS ix_polls_slug ON polls (slug);
+-- Pattern-ops index for slug prefix (LIKE 'base%') lookups when generating unique slugs
+CREATE INDEX IF NOT EXISTS ix_polls_slug_pattern ON polls (slug varchar_pattern_ops);
+-- Expression indexes for case-insensitive slug/title lookups
+CREATE INDEX IF NOT EXISTS ix_polls_lower_slug ON polls (lower(slug));
+CREATE INDEX IF NOT EXISTS ix_polls_lower_title ON polls (lower(title));
+-- Partial index over attendee-visible polls for /poll/active (optionally filtered by type)
+CREATE INDEX IF NOT EXISTS ix_polls_active_lower_type ON polls (lower(poll_type)) WHERE is_active = true AND archived = false;
 
 -- Questions
 CREATE TABLE IF NOT EXISTS questions (
     id SERIAL PRIMARY KEY,
-    poll_id INTEGER NOT NULL REFERENCES polls(id),
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
     text TEXT NOT NULL
 );
 
 -- Choices
 CREATE TABLE IF NOT EXISTS choices (
     id SERIAL PRIMARY KEY,
-    question_id INTEGER NOT NULL REFERENCES questions(id),
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
     text VARCHAR(255) NOT NULL,
     is_correct BOOLEAN DEFAULT FALSE
 );
@@ -47,7 +59,7 @@ CREATE TABLE IF NOT EXISTS choices (
 -- Participants
 CREATE TABLE IF NOT EXISTS participants (
     id SERIAL PRIMARY KEY,
-    poll_id INTEGER NOT NULL REFERENCES polls(id),
+    poll_id INTEGER NOT NULL REFERENCES polls(id) ON DELETE CASCADE,
     name VARCHAR(150) NOT NULL,
     company VARCHAR(150) NULL
 );
@@ -55,9 +67,9 @@ CREATE TABLE IF NOT EXISTS participants (
 -- Votes
 CREATE TABLE IF NOT EXISTS votes (
     id SERIAL PRIMARY KEY,
-    participant_id INTEGER NOT NULL REFERENCES participants(id),
-    choice_id INTEGER NOT NULL REFERENCES choices(id),
-    question_id INTEGER NOT NULL REFERENCES questions(id),
+    participant_id INTEGER NOT NULL REFERENCES participants(id) ON DELETE CASCADE,
+    choice_id INTEGER NOT NULL REFERENCES choices(id) ON DELETE CASCADE,
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
     timestamp TIMESTAMPTZ DEFAULT NOW()
 );
 